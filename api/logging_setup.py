@@ -0,0 +1,45 @@
+import logging
+import logging.handlers
+import queue
+from typing import List, Optional
+
+
+# --- Fila de logs ---
+# O root logger passa a só enfileirar os registros; os handlers reais
+# (stream/arquivo) rodam na thread do QueueListener, fora do caminho do request.
+_listener: Optional[logging.handlers.QueueListener] = None
+_handlers: List[logging.Handler] = []
+
+
+def start_log_queue():
+    global _listener, _handlers
+    if _listener is not None:
+        return
+
+    root = logging.getLogger()
+    _handlers = root.handlers[:]
+    log_queue = queue.Queue(-1)
+
+    for handler in _handlers:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    _listener = logging.handlers.QueueListener(log_queue, *_handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_log_queue():
+    global _listener
+    if _listener is None:
+        return
+
+    # Esvazia a fila e devolve os handlers originais ao root logger
+    _listener.stop()
+    _listener = None
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    for handler in _handlers:
+        root.addHandler(handler)
@@ -1,17 +1,27 @@
-from fastapi import FastAPI, HTTPException, Request, status
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from supabase import create_client
+from supabase import create_client, ClientOptions
 import os
 from dotenv import load_dotenv
-from pydantic import BaseModel, validator
 from typing import Optional, List
 from datetime import datetime
 import logging
+import httpx
+import orjson
+import uuid
 import uvicorn
+from pagination import encode_cursor, decode_cursor
+from logging_setup import start_log_queue, stop_log_queue
+from models import TaskCreate, TaskBatch, SupabaseTaskResponse as TaskResponse, SupabaseTaskPage as TaskPage
 
 # --- Configuração inicial ---
 load_dotenv()
 
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
 app = FastAPI(
     title="TaskMaster API",
     description="API for managing tasks",
@@ -19,11 +29,14 @@ app = FastAPI(
 )
 
 # --- CORS ---
+# Origens permitidas vêm do .env, separadas por vírgula (ex.: CORS_ORIGINS=http://localhost:3000)
+CORS_ORIGINS = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "").split(",") if origin.strip()]
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=CORS_ORIGINS,
+    allow_methods=["GET", "POST", "PUT", "DELETE"],
+    allow_headers=["authorization", "content-type"],
 )
 
 # --- Supabase ---
@@ -33,36 +46,67 @@ supabase_key = os.getenv("SUPABASE_KEY")
 if not supabase_url or not supabase_key:
     raise ValueError("Supabase URL and Supabase API key must be set")
 
+# Limites de conexão compartilhados pelos clientes HTTP do Supabase
+HTTP_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20)
+
 try:
-    supabase = create_client(supabase_url, supabase_key)
+    # Sessão httpx própria (keep-alive + HTTP/2) em vez da criada pelo supabase-py
+    supabase = create_client(
+        supabase_url,
+        supabase_key,
+        options=ClientOptions(
+            httpx_client=httpx.Client(http2=True, limits=HTTP_LIMITS, timeout=10),
+        ),
+    )
     print("✅ Conexão Supabase estabelecida!")
 except Exception as e:
     print(f"❌ Erro na conexão Supabase: {e}")
     supabase = None
 
+# Cliente HTTP compartilhado (keep-alive + HTTP/2) para o PostgREST,
+# aberto no startup para não refazer o handshake TLS a cada request
+http_client: Optional[httpx.AsyncClient] = None
+
+
+@app.on_event("startup")
+async def open_http_client():
+    global http_client
+    http_client = httpx.AsyncClient(
+        base_url=f"{supabase_url}/rest/v1",
+        headers={"apikey": supabase_key, "Authorization": f"Bearer {supabase_key}"},
+        http2=True,
+        limits=HTTP_LIMITS,
+    )
+
+
+@app.on_event("startup")
+async def warm_supabase_connections():
+    # Abre as conexões TLS antes do primeiro request (equivalente ao pool_pre_ping).
+    # Cada cliente é aquecido separadamente: a falha de um não impede o outro.
+    if supabase:
+        try:
+            # .execute() é síncrono e bloqueia o event loop; aceitável só no startup
+            supabase.table("tasks").select("id").limit(1).execute()
+        except Exception as e:
+            logging.warning("Falha ao aquecer o cliente supabase-py: %s", e)
 
-# --- Models ---
-class TaskBase(BaseModel):
-    title: str
-    description: Optional[str] = None
-    priority: int = 3
+    try:
+        await http_client.get("/tasks", params={"select": "id", "limit": 1})
+    except Exception as e:
+        logging.warning("Falha ao aquecer o cliente HTTP do PostgREST: %s", e)
 
-    @validator('priority')
-    def validate_priority(cls, v):
-        if v not in range(1, 6):
-            raise ValueError("Priority must be between 1 and 5")
-        return v
 
+@app.on_event("shutdown")
+async def close_http_client():
+    await http_client.aclose()
 
-class TaskCreate(TaskBase):
-    user_id: str
 
+# Colunas enviadas no INSERT de tarefas
+TASK_INSERT_FIELDS = {"title", "description", "priority", "user_id"}
 
-class TaskResponse(TaskCreate):
-    id: str
-    created_at: datetime
-    updated_at: datetime
-    is_completed: bool
+# Colunas de SupabaseTaskResponse; list_tasks devolve as linhas sem passar
+# pelo response_model, então o select não pode ser "*"
+TASK_SELECT = "id,title,description,priority,user_id,is_completed,created_at,updated_at"
 
 
 # --- Debug Route ---
@@ -99,12 +143,12 @@ async def create_task(task: TaskCreate):
 
     try:
         # Converter para dict e garantir que está serializável
-        task_data = task.dict()
-        print(f"📝 Tentando criar tarefa: {task_data}")
+        task_data = task.model_dump(include=TASK_INSERT_FIELDS)
+        logging.debug("📝 Tentando criar tarefa: %s", task_data)
 
         response = supabase.table("tasks").insert(task_data).execute()
 
-        print(f"📨 Resposta bruta: {response}")
+        logging.debug("📨 Resposta bruta: %s", response)
 
         if hasattr(response, 'data') and response.data:
             return response.data[0]
@@ -112,30 +156,72 @@ async def create_task(task: TaskCreate):
             raise HTTPException(status_code=400, detail="No data returned from database")
 
     except Exception as e:
-        print(f"💥 Erro detalhado: {str(e)}")
+        logging.error("💥 Erro detalhado: %s", e)
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
-@app.get("/tasks/", response_model=List[TaskResponse])
-async def list_tasks(skip: int = 0, limit: int = 10, user_id: Optional[str] = None):
+# `def` e não `async def`: o .execute() do supabase-py é síncrono e, com até
+# 500 linhas, travaria o event loop; o FastAPI roda esta rota no threadpool
+@app.post("/tasks/batch", response_model=List[TaskResponse])
+def create_tasks_batch(tasks: TaskBatch):
     if not supabase:
         raise HTTPException(status_code=500, detail="Database connection not available")
 
     try:
-        query = supabase.table("tasks").select("*")
+        # O PostgREST aceita um array: o lote inteiro vai em um único INSERT
+        response = supabase.table("tasks").insert([task.model_dump(include=TASK_INSERT_FIELDS) for task in tasks]).execute()
+    except Exception as e:
+        logging.error("💥 Erro ao criar tarefas em lote: %s", e)
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-        if user_id:
-            query = query.eq("user_id", user_id)
+    # Fora do try: o 400 não pode ser engolido pelo except acima e virar 500
+    if hasattr(response, 'data') and response.data:
+        return response.data
+    raise HTTPException(status_code=400, detail="No data returned from database")
 
-        response = query.range(skip, skip + limit - 1).execute()
 
-        if hasattr(response, 'data'):
-            return response.data
-        else:
-            return []
+@app.get("/tasks/", response_model=TaskPage)
+async def list_tasks(cursor: Optional[str] = None, limit: int = 10, user_id: Optional[str] = None):
+    if not supabase:
+        raise HTTPException(status_code=500, detail="Database connection not available")
+
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, parse_id=uuid.UUID)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    try:
+        params = {"select": TASK_SELECT, "order": "created_at.desc,id.desc", "limit": limit}
+
+        if user_id:
+            params["user_id"] = f"eq.{user_id}"
+
+        if after:
+            cursor_created_at, cursor_id = after[0].isoformat(), after[1]
+            params["or"] = (
+                f'(created_at.lt."{cursor_created_at}",'
+                f'and(created_at.eq."{cursor_created_at}",id.lt."{cursor_id}"))'
+            )
+
+        response = await http_client.get("/tasks", params=params)
+        response.raise_for_status()
+        tasks = response.json()
+
+        next_cursor = None
+        if tasks and len(tasks) == limit:
+            last = tasks[-1]
+            next_cursor = encode_cursor(last["created_at"], last["id"])
+
+        # Linhas já vêm serializadas do PostgREST: devolve sem revalidar no Pydantic
+        return Response(
+            content=orjson.dumps({"items": tasks, "next_cursor": next_cursor}),
+            media_type="application/json",
+        )
 
     except Exception as e:
-        print(f"💥 Erro ao buscar tarefas: {str(e)}")
+        logging.error("💥 Erro ao buscar tarefas: %s", e)
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
@@ -149,11 +235,15 @@ async def health_check():
     }
 
 
-# --- Configuração de Log ---
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# --- Log de requests ---
+@app.on_event("startup")
+def start_logging():
+    start_log_queue()
+
+
+@app.on_event("shutdown")
+def stop_logging():
+    stop_log_queue()
 
 
 @app.middleware("http")
@@ -164,4 +254,12 @@ async def log_requests(request: Request, call_next):
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(
+        "main-supabase-erro:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        loop="uvloop",
+        http="httptools",
+        log_level="info",
+    )
@@ -1,19 +1,29 @@
-from fastapi import FastAPI, HTTPException, Request, status
+from fastapi import FastAPI, HTTPException, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from dotenv import load_dotenv
-from pydantic import BaseModel, validator
 from typing import Optional, List
 from datetime import datetime
 import logging
+import orjson
 import uvicorn
 import sqlite3
-import json
-from contextlib import contextmanager
+import queue
+import time
+from functools import lru_cache
+from contextlib import closing, contextmanager
+from pagination import encode_cursor, decode_cursor
+from logging_setup import start_log_queue, stop_log_queue
+from models import TaskBase, TaskCreate, TaskBatch, TaskResponse, TaskPage
 
 # --- Configuração inicial ---
 load_dotenv()
 
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
 app = FastAPI(
     title="TaskMaster API",
     description="API for managing tasks",
@@ -21,29 +31,153 @@ app = FastAPI(
 )
 
 # --- CORS ---
+# Origens permitidas vêm do .env, separadas por vírgula (ex.: CORS_ORIGINS=http://localhost:3000)
+CORS_ORIGINS = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "").split(",") if origin.strip()]
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=CORS_ORIGINS,
+    allow_methods=["GET", "POST", "PUT", "DELETE"],
+    allow_headers=["authorization", "content-type"],
 )
 
 # --- SQLite Database ---
 DATABASE_URL = "tasks.db"
+POOL_SIZE = 8
+
+# --- SQL ---
+# O sqlite3 guarda os statements preparados por conexão, indexados pelo texto
+# do SQL; usar sempre as mesmas constantes mantém esse cache acertando.
+# As colunas saem cruas: os conversores registrados abaixo devolvem datetime/bool.
+TASK_COLUMNS = "id, title, description, priority, user_id, is_completed, created_at, updated_at"
+TASK_FIELDS = tuple(TASK_COLUMNS.split(", "))
+
+SQL_INSERT = f'''
+             INSERT INTO tasks (title, description, priority, user_id)
+             VALUES (?, ?, ?, ?)
+             RETURNING {TASK_COLUMNS}
+             '''
+
+SQL_GET_BY_ID = f"SELECT {TASK_COLUMNS} FROM tasks WHERE id = ?"
+
+SQL_LIST = f"SELECT {TASK_COLUMNS} FROM tasks"
+
+SQL_UPDATE = f'''
+             UPDATE tasks
+             SET title       = ?,
+                 description = ?,
+                 priority    = ?,
+                 updated_at  = CURRENT_TIMESTAMP
+             WHERE id = ?
+             RETURNING {TASK_COLUMNS}
+             '''
+
+SQL_COMPLETE = '''
+               UPDATE tasks
+               SET is_completed = TRUE,
+                   updated_at   = CURRENT_TIMESTAMP
+               WHERE id = ?
+               '''
+
+SQL_DELETE = 'DELETE FROM tasks WHERE id = ?'
+
+SQL_COUNT = "SELECT COUNT(*) as count FROM tasks"
+
+
+@lru_cache(maxsize=None)
+def list_query(by_user: bool, by_completed: bool, after_cursor: bool) -> str:
+    # Um texto de SQL estável por combinação de filtros
+    conditions = []
+    if by_user:
+        conditions.append("user_id = ?")
+    if by_completed:
+        conditions.append("is_completed = ?")
+    if after_cursor:
+        conditions.append("(created_at, id) < (?, ?)")
+
+    query = SQL_LIST
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return query + " ORDER BY created_at DESC, id DESC LIMIT ?"
+
+
+# Parâmetros que não afetam nenhuma linha; tudo roda dentro de um ROLLBACK
+_WARMUP_STATEMENTS = [
+    (SQL_INSERT, ("", None, 3, "")),
+    (SQL_GET_BY_ID, (-1,)),
+    (list_query(False, False, False), (0,)),
+    (SQL_UPDATE, ("", None, 3, -1)),
+    (SQL_COMPLETE, (-1,)),
+    (SQL_DELETE, (-1,)),
+    (SQL_COUNT, ()),
+]
+
+
+# Tipos declarados na tabela -> tipos Python (usados com PARSE_DECLTYPES)
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("BOOLEAN", lambda value: value != b"0")
+
+# Pool de conexões reutilizadas entre requests (aberto no startup)
+_pool: Optional[queue.Queue] = None
+
+
+def _warm_statements(conn):
+    conn.execute("BEGIN")
+    try:
+        for sql, params in _WARMUP_STATEMENTS:
+            conn.execute(sql, params).close()
+    finally:
+        conn.rollback()
+
+
+def _connect():
+    conn = sqlite3.connect(
+        DATABASE_URL,
+        check_same_thread=False,
+        isolation_level=None,
+        cached_statements=256,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+    )
+    conn.row_factory = sqlite3.Row  # Para retornar dicionários
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-20000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def open_pool():
+    global _pool
+    _pool = queue.Queue(maxsize=POOL_SIZE)
+    for _ in range(POOL_SIZE):
+        conn = _connect()
+        _warm_statements(conn)
+        _pool.put(conn)
+
+
+def close_pool():
+    # Startup pode ter falhado antes de abrir o pool
+    if _pool is None:
+        return
+
+    while not _pool.empty():
+        _pool.get_nowait().close()
 
 
 @contextmanager
 def get_db():
-    conn = sqlite3.connect(DATABASE_URL)
-    conn.row_factory = sqlite3.Row  # Para retornar dicionários
+    conn = _pool.get()
     try:
         yield conn
     finally:
-        conn.close()
+        # Nunca devolver ao pool uma conexão com transação aberta
+        if conn.in_transaction:
+            conn.rollback()
+        _pool.put(conn)
 
 
 def init_db():
-    with get_db() as conn:
+    with closing(_connect()) as conn:
         conn.execute('''
                      CREATE TABLE IF NOT EXISTS tasks
                      (
@@ -80,39 +214,39 @@ def init_db():
                          CURRENT_TIMESTAMP
                      )
                      ''')
+        conn.execute('''
+                     CREATE INDEX IF NOT EXISTS idx_tasks_user_created
+                         ON tasks (user_id, created_at DESC, id DESC)
+                     ''')
+        conn.execute('''
+                     CREATE INDEX IF NOT EXISTS idx_tasks_user_completed_created
+                         ON tasks (user_id, is_completed, created_at DESC, id DESC)
+                     ''')
+        conn.execute('''
+                     CREATE INDEX IF NOT EXISTS idx_tasks_created
+                         ON tasks (created_at DESC, id DESC)
+                     ''')
+        # Estatísticas para o planner escolher os índices acima
+        conn.execute("ANALYZE")
         conn.commit()
         print("✅ Banco de dados SQLite inicializado!")
 
 
-# Inicializar banco ao iniciar a API
-init_db()
-
-
-# --- Models ---
-class TaskBase(BaseModel):
-    title: str
-    description: Optional[str] = None
-    priority: int = 3
-
-    @validator('priority')
-    def validate_priority(cls, v):
-        if v not in range(1, 6):
-            raise ValueError("Priority must be between 1 and 5")
-        return v
+# Inicializar banco e pool ao iniciar a API
+@app.on_event("startup")
+def startup():
+    init_db()
+    open_pool()
 
 
-class TaskCreate(TaskBase):
-    user_id: str
-
-
-class TaskResponse(TaskCreate):
-    id: int
-    created_at: datetime
-    updated_at: datetime
-    is_completed: bool
+@app.on_event("shutdown")
+def shutdown():
+    close_pool()
 
 
 # --- Routes ---
+# As rotas que acessam o SQLite são `def` e não `async def`: o FastAPI as roda
+# no threadpool, então as chamadas bloqueantes do sqlite3 não travam o event loop.
 @app.get("/")
 async def root():
     return {
@@ -123,29 +257,14 @@ async def root():
 
 
 @app.post("/tasks/", response_model=TaskResponse, status_code=status.HTTP_201_CREATED)
-async def create_task(task: TaskCreate):
+def create_task(task: TaskCreate):
     try:
         with get_db() as conn:
             cursor = conn.cursor()
 
-            cursor.execute('''
-                           INSERT INTO tasks (title, description, priority, user_id)
-                           VALUES (?, ?, ?, ?)
-                           ''', (task.title, task.description, task.priority, task.user_id))
-
-            conn.commit()
-            task_id = cursor.lastrowid
-
-            # Buscar tarefa criada
-            cursor.execute('''
-                           SELECT *,
-                                  datetime(created_at) as created_at,
-                                  datetime(updated_at) as updated_at
-                           FROM tasks
-                           WHERE id = ?
-                           ''', (task_id,))
-
+            cursor.execute(SQL_INSERT, (task.title, task.description, task.priority, task.user_id))
             task_data = cursor.fetchone()
+            conn.commit()
 
             if not task_data:
                 raise HTTPException(status_code=400, detail="Error creating task")
@@ -158,102 +277,110 @@ async def create_task(task: TaskCreate):
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
-@app.get("/tasks/", response_model=List[TaskResponse])
-async def list_tasks(
-        skip: int = 0,
+@app.post("/tasks/batch", response_model=List[TaskResponse], status_code=status.HTTP_201_CREATED)
+def create_tasks_batch(tasks: TaskBatch):
+    try:
+        with get_db() as conn:
+            cursor = conn.cursor()
+
+            # Um único commit (um fsync) para o lote inteiro. Não usamos
+            # executemany porque ele descarta as linhas do RETURNING.
+            cursor.execute("BEGIN")
+            created = []
+            for task in tasks:
+                cursor.execute(SQL_INSERT, (task.title, task.description, task.priority, task.user_id))
+                created.append(dict(cursor.fetchone()))
+            conn.commit()
+
+            return created
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@app.get("/tasks/", response_model=TaskPage)
+def list_tasks(
+        cursor: Optional[str] = None,
         limit: int = 100,
         user_id: Optional[str] = None,
         completed: Optional[bool] = None
 ):
+    after = None
+    if cursor:
+        try:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+            # Mesmo formato texto gravado pelo CURRENT_TIMESTAMP
+            after = (str(cursor_created_at), cursor_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
     try:
         with get_db() as conn:
-            cursor = conn.cursor()
+            db_cursor = conn.cursor()
+            # Tuplas simples em vez de sqlite3.Row (só neste cursor): as colunas
+            # vêm na ordem de TASK_FIELDS e viram dict sem lookup por nome
+            db_cursor.row_factory = None
 
-            query = '''
-                    SELECT *,
-                           datetime(created_at) as created_at,
-                           datetime(updated_at) as updated_at
-                    FROM tasks \
-                    '''
+            query = list_query(bool(user_id), completed is not None, after is not None)
             params = []
 
-            conditions = []
             if user_id:
-                conditions.append("user_id = ?")
                 params.append(user_id)
             if completed is not None:
-                conditions.append("is_completed = ?")
                 params.append(completed)
+            if after:
+                params.extend(after)
 
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
+            params.append(limit)
 
-            query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
-            params.extend([limit, skip])
+            db_cursor.execute(query, params)
+            tasks = [dict(zip(TASK_FIELDS, task)) for task in db_cursor.fetchall()]
 
-            cursor.execute(query, params)
-            tasks = cursor.fetchall()
+            next_cursor = None
+            if tasks and len(tasks) == limit:
+                last = tasks[-1]
+                next_cursor = encode_cursor(last["created_at"], last["id"])
 
-            return [dict(task) for task in tasks]
+            return Response(
+                content=orjson.dumps({"items": tasks, "next_cursor": next_cursor}),
+                media_type="application/json",
+            )
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
 @app.get("/tasks/{task_id}", response_model=TaskResponse)
-async def get_task(task_id: int):
+def get_task(task_id: int):
     try:
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                           SELECT *,
-                                  datetime(created_at) as created_at,
-                                  datetime(updated_at) as updated_at
-                           FROM tasks
-                           WHERE id = ?
-                           ''', (task_id,))
+            cursor.execute(SQL_GET_BY_ID, (task_id,))
 
             task = cursor.fetchone()
 
             if not task:
                 raise HTTPException(status_code=404, detail="Task not found")
 
-            return dict(task)
+            return Response(content=orjson.dumps(dict(task)), media_type="application/json")
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
 @app.put("/tasks/{task_id}", response_model=TaskResponse)
-async def update_task(task_id: int, task: TaskBase):
+def update_task(task_id: int, task: TaskBase):
     try:
         with get_db() as conn:
             cursor = conn.cursor()
 
-            cursor.execute('''
-                           UPDATE tasks
-                           SET title       = ?,
-                               description = ?,
-                               priority    = ?,
-                               updated_at  = CURRENT_TIMESTAMP
-                           WHERE id = ?
-                           ''', (task.title, task.description, task.priority, task_id))
-
+            cursor.execute(SQL_UPDATE, (task.title, task.description, task.priority, task_id))
+            task_data = cursor.fetchone()
             conn.commit()
 
-            if cursor.rowcount == 0:
+            if not task_data:
                 raise HTTPException(status_code=404, detail="Task not found")
 
-            # Buscar tarefa atualizada
-            cursor.execute('''
-                           SELECT *,
-                                  datetime(created_at) as created_at,
-                                  datetime(updated_at) as updated_at
-                           FROM tasks
-                           WHERE id = ?
-                           ''', (task_id,))
-
-            task_data = cursor.fetchone()
             return dict(task_data)
 
     except Exception as e:
@@ -261,17 +388,12 @@ async def update_task(task_id: int, task: TaskBase):
 
 
 @app.put("/tasks/{task_id}/complete")
-async def complete_task(task_id: int):
+def complete_task(task_id: int):
     try:
         with get_db() as conn:
             cursor = conn.cursor()
 
-            cursor.execute('''
-                           UPDATE tasks
-                           SET is_completed = TRUE,
-                               updated_at   = CURRENT_TIMESTAMP
-                           WHERE id = ?
-                           ''', (task_id,))
+            cursor.execute(SQL_COMPLETE, (task_id,))
 
             conn.commit()
 
@@ -285,12 +407,12 @@ async def complete_task(task_id: int):
 
 
 @app.delete("/tasks/{task_id}")
-async def delete_task(task_id: int):
+def delete_task(task_id: int):
     try:
         with get_db() as conn:
             cursor = conn.cursor()
 
-            cursor.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+            cursor.execute(SQL_DELETE, (task_id,))
             conn.commit()
 
             if cursor.rowcount == 0:
@@ -303,20 +425,32 @@ async def delete_task(task_id: int):
 
 
 # --- Health Check ---
+# Probes de load balancer/K8s batem aqui com frequência: o COUNT(*) é
+# reaproveitado por alguns segundos em vez de ir ao banco a cada chamada
+HEALTH_CACHE_TTL = 5  # segundos
+
+# (time.monotonic() da última consulta, total de tarefas)
+_health_cache = (0.0, None)
+
+
 @app.get("/health")
-async def health_check():
+def health_check():
+    global _health_cache
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) as count FROM tasks")
-            count = cursor.fetchone()["count"]
+        checked_at, count = _health_cache
+        if count is None or time.monotonic() - checked_at >= HEALTH_CACHE_TTL:
+            with get_db() as conn:
+                cursor = conn.cursor()
+                cursor.execute(SQL_COUNT)
+                count = cursor.fetchone()["count"]
+            _health_cache = (time.monotonic(), count)
 
-            return {
-                "status": "healthy",
-                "timestamp": datetime.now().isoformat(),
-                "database": "SQLite",
-                "total_tasks": count
-            }
+        return {
+            "status": "healthy",
+            "timestamp": datetime.now().isoformat(),
+            "database": "SQLite",
+            "total_tasks": count
+        }
     except Exception as e:
         return {
             "status": "unhealthy",
@@ -326,7 +460,7 @@ async def health_check():
 
 # --- Debug Routes ---
 @app.get("/debug/database")
-async def debug_database():
+def debug_database():
     try:
         with get_db() as conn:
             cursor = conn.cursor()
@@ -335,7 +469,7 @@ async def debug_database():
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
             tables = cursor.fetchall()
 
-            cursor.execute("SELECT COUNT(*) as count FROM tasks")
+            cursor.execute(SQL_COUNT)
             task_count = cursor.fetchone()["count"]
 
             return {
@@ -348,11 +482,15 @@ async def debug_database():
         return {"error": str(e)}
 
 
-# --- Configuração de Log ---
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# --- Log de requests ---
+@app.on_event("startup")
+def start_logging():
+    start_log_queue()
+
+
+@app.on_event("shutdown")
+def stop_logging():
+    stop_log_queue()
 
 
 @app.middleware("http")
@@ -363,4 +501,12 @@ async def log_requests(request: Request, call_next):
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        loop="uvloop",
+        http="httptools",
+        log_level="info",
+    )
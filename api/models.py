@@ -0,0 +1,41 @@
+from pydantic import BaseModel, Field
+from typing import Annotated, Optional, List
+from datetime import datetime
+
+# Máximo de tarefas aceitas por POST /tasks/batch
+MAX_BATCH_SIZE = 500
+
+
+# --- Models ---
+class TaskBase(BaseModel):
+    title: str
+    description: Optional[str] = None
+    priority: Annotated[int, Field(ge=1, le=5)] = 3
+
+
+class TaskCreate(TaskBase):
+    user_id: str
+
+
+TaskBatch = Annotated[List[TaskCreate], Field(min_length=1, max_length=MAX_BATCH_SIZE)]
+
+
+class TaskResponse(TaskCreate):
+    id: int
+    created_at: datetime
+    updated_at: datetime
+    is_completed: bool
+
+
+class TaskPage(BaseModel):
+    items: List[TaskResponse]
+    next_cursor: Optional[str] = None
+
+
+# Supabase usa UUID como chave primária
+class SupabaseTaskResponse(TaskResponse):
+    id: str
+
+
+class SupabaseTaskPage(TaskPage):
+    items: List[SupabaseTaskResponse]
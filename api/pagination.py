@@ -0,0 +1,23 @@
+import base64
+from datetime import datetime
+from typing import Any, Callable, Tuple
+
+
+# --- Cursor (keyset) pagination ---
+# O cursor é o par (created_at, id) da última tarefa da página, em base64,
+# para que a próxima página seja buscada com WHERE (created_at, id) < (?, ?)
+# em vez de OFFSET.
+def encode_cursor(created_at, task_id) -> str:
+    raw = f"{created_at}|{task_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str, parse_id: Callable[[str], Any] = int) -> Tuple[datetime, Any]:
+    # O cursor vem do cliente: created_at e id são validados aqui para que
+    # nada fora do formato esperado chegue à query
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, task_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), parse_id(task_id)
+    except ValueError:
+        raise ValueError("Invalid cursor")